@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+التحكم في القبول (admission control) وتحديد معدل الطلبات لكل عميل.
+
+- لكل مسار وزن (ROUTE_WEIGHTS): المسارات الثقيلة مثل /company/all تستهلك سعة أكبر
+  من الاستعلامات النقطية. المسارات التي يبلغ وزنها HEAVY_WEIGHT لا يمكنها مجتمعة تجاوز
+  HEAVY_CAPACITY حتى تبقى سعة للاستعلامات الخفيفة والمتوسطة (مثل /company/range).
+- عدد الطلبات المنتظرة محدود (MAX_QUEUE)؛ عند الامتلاء أو انتهاء مهلة الانتظار نرجع 503.
+- دلو رموز (token bucket) لكل عميل، معطّل افتراضيًا (RATE_LIMIT_RPS=0)؛ عند نفاده نرجع 429.
+  العميل هو مفتاح X-API-Key إن كان ضمن API_KEYS المعرّفة، وإلا عنوان IP (حتى لا يتهرّب
+  العميل بمفاتيح عشوائية). خلف proxy لا يثق به uvicorn يشترك كل المستخدمين في IP الـ proxy،
+  لذلك لا يُفعَّل إلا مع API_KEYS أو --forwarded-allow-ips.
+كل الردود المرفوضة تحمل ترويسة Retry-After.
+"""
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict
+
+from starlette.responses import JSONResponse
+
+# وزن كل مسار (الافتراضي 1)
+ROUTE_WEIGHTS = {
+    "/company/all": 8,
+    "/company/range/all": 4,
+    "/company/symbol": 2,
+    "/company/range": 2,
+    "/variation/symbol": 2,
+    "/variation/bars": 2,
+}
+
+# المسارات التي يبلغ وزنها هذا الحد تُحسب أيضًا من HEAVY_CAPACITY
+HEAVY_WEIGHT = int(os.getenv("ADMISSION_HEAVY_WEIGHT", "4"))
+
+# مسارات لا تخضع للتحكم
+EXEMPT_PATHS = {"/health"}
+
+CAPACITY = int(os.getenv("ADMISSION_CAPACITY", "16"))
+HEAVY_CAPACITY = int(os.getenv("ADMISSION_HEAVY_CAPACITY", "8"))
+MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "32"))
+QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "5"))
+RATE_LIMIT_RPS = float(os.getenv("RATE_LIMIT_RPS", "0"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "20"))
+
+# مفاتيح العملاء المعروفة (مفصولة بفواصل)؛ المفاتيح الأخرى تُتجاهل ويُعتمد على IP
+API_KEYS = frozenset(k.strip() for k in os.getenv("API_KEYS", "").split(",") if k.strip())
+
+# الحد الأقصى لعدد العملاء المحفوظين (الأقدم استعمالًا يُحذف أولًا)
+MAX_CLIENTS = 10000
+
+
+class WeightedLimiter:
+    """
+    إشارة (semaphore) موزونة: الطلب يحتاج weight وحدة من CAPACITY،
+    والطلبات الثقيلة (heavy=True) تحتاج أيضًا وحدات من HEAVY_CAPACITY.
+    """
+
+    def __init__(self, capacity, heavy_capacity, max_queue):
+        self.capacity = capacity
+        self.heavy_capacity = heavy_capacity
+        self.max_queue = max_queue
+        self.used = 0
+        self.heavy_used = 0
+        self.waiting = 0
+        self._cond = None
+        self._notify_tasks = set()
+
+    def _fits(self, weight, heavy):
+        if self.used + weight > self.capacity:
+            return False
+        if heavy and self.heavy_used + weight > self.heavy_capacity:
+            return False
+        return True
+
+    async def acquire(self, weight, timeout, heavy=False):
+        """
+        إرجاع True عند الحصول على السعة، و False إذا كان الطابور ممتلئًا أو انتهت المهلة.
+        """
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+
+        async with self._cond:
+            if not self._fits(weight, heavy):
+                if self.waiting >= self.max_queue:
+                    return False
+                self.waiting += 1
+                try:
+                    await asyncio.wait_for(self._cond.wait_for(lambda: self._fits(weight, heavy)), timeout)
+                except asyncio.TimeoutError:
+                    return False
+                finally:
+                    self.waiting -= 1
+            self.used += weight
+            if heavy:
+                self.heavy_used += weight
+            return True
+
+    def release(self, weight, heavy=False):
+        """
+        تحرير السعة بشكل متزامن (بدون انتظار قفل) حتى لا تضيع إذا أُلغيت المهمة،
+        ثم إيقاظ المنتظرين في مهمة منفصلة.
+        """
+        self.used -= weight
+        if heavy:
+            self.heavy_used -= weight
+        if self._cond is not None and self.waiting:
+            task = asyncio.get_running_loop().create_task(self._notify())
+            self._notify_tasks.add(task)
+            task.add_done_callback(self._notify_tasks.discard)
+
+    async def _notify(self):
+        async with self._cond:
+            self._cond.notify_all()
+
+
+class TokenBucket:
+    """
+    دلو رموز لكل عميل: يمتلئ بمعدل rate رمز/ثانية حتى burst.
+    """
+
+    def __init__(self, rate, burst, max_clients=MAX_CLIENTS):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self.buckets = OrderedDict()
+
+    def take(self, key, cost):
+        """
+        إرجاع 0 إذا سُمح بالطلب، وإلا عدد الثواني المتبقية قبل توفر الرموز.
+        """
+        now = time.monotonic()
+        tokens, last = self.buckets.get(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        cost = min(cost, self.burst)
+
+        allowed = tokens >= cost
+        self.buckets[key] = (tokens - cost if allowed else tokens, now)
+        self.buckets.move_to_end(key)
+        # LRU بحد أقصى ثابت: حذف الأقدم استعمالًا في O(1)
+        while len(self.buckets) > self.max_clients:
+            self.buckets.popitem(last=False)
+
+        if allowed:
+            return 0
+        return (cost - tokens) / self.rate
+
+
+def client_key(scope, api_keys=API_KEYS):
+    if api_keys:
+        for name, value in scope.get("headers", []):
+            if name == b"x-api-key":
+                key = value.decode("latin-1")
+                if key in api_keys:
+                    return "key:" + key
+                break
+    client = scope.get("client")
+    return "ip:" + (client[0] if client else "unknown")
+
+
+def _reject(status, detail, retry_after):
+    return JSONResponse(
+        {"detail": detail},
+        status_code=status,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware يطبّق تحديد المعدل لكل عميل ثم التحكم في القبول الموزون.
+    """
+
+    def __init__(
+        self,
+        app,
+        capacity=CAPACITY,
+        heavy_capacity=HEAVY_CAPACITY,
+        heavy_weight=HEAVY_WEIGHT,
+        max_queue=MAX_QUEUE,
+        queue_timeout=QUEUE_TIMEOUT,
+        rate=RATE_LIMIT_RPS,
+        burst=RATE_LIMIT_BURST,
+    ):
+        self.app = app
+        self.limiter = WeightedLimiter(capacity, heavy_capacity, max_queue)
+        self.heavy_weight = heavy_weight
+        self.queue_timeout = queue_timeout
+        # rate=0 يعطّل تحديد المعدل
+        self.buckets = TokenBucket(rate, burst) if rate > 0 else None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        weight = ROUTE_WEIGHTS.get(scope["path"], 1)
+        # التصنيف حسب وزن المسار قبل أي قصّ حتى يبقى الثقيل ثقيلًا
+        heavy = weight >= self.heavy_weight
+        if heavy:
+            weight = min(weight, self.limiter.heavy_capacity)
+        weight = max(1, min(weight, self.limiter.capacity))
+
+        if self.buckets is not None:
+            wait = self.buckets.take(client_key(scope), weight)
+            if wait:
+                response = _reject(429, "تم تجاوز عدد الطلبات المسموح به. حاول لاحقًا.", wait)
+                await response(scope, receive, send)
+                return
+
+        if not await self.limiter.acquire(weight, self.queue_timeout, heavy):
+            response = _reject(503, "الخادم مشغول حاليًا. حاول لاحقًا.", self.queue_timeout)
+            await response(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.limiter.release(weight, heavy)
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+تجميع سجلات DailyVariation في شموع OHLC داخل SQLite، مع ذاكرة للشموع المغلقة.
+
+ذاكرة الشموع: (symbol, seconds) -> (قائمة الشموع المغلقة, بداية الشمعة المفتوحة).
+بعد أول طلب لا يُقرأ من القاعدة إلا ما يبدأ من الشمعة المفتوحة (نطاق على المفتاح
+الأساسي (symbol, timestamp) للسجلات بصيغة ISO).
+الشمعة المغلقة نهائية: السجلات التي تصل متأخرة بتوقيت داخلها لا تظهر إلا بعد clear_cache
+(يُستدعى تلقائيًا في main.py بعد تطبيق اللقطات، وهي الطريقة الوحيدة لوصول سجلات قديمة إلى القاعدة).
+"""
+import threading
+
+_CACHE = {}
+_LOCK = threading.Lock()
+
+# السجلات بصيغة ISO: YYYY-MM-DD أو YYYY-MM-DD HH:MM:SS أو YYYY-MM-DDTHH:MM:SS
+_ISO_SQL = """
+    SELECT replace(timestamp, 'T', ' ') AS timestamp, price
+    FROM DailyVariation
+    WHERE symbol = :symbol AND timestamp GLOB '[0-9][0-9][0-9][0-9]-*' {since}
+"""
+
+# السجلات بصيغة DD/MM/YYYY [HH:MM:SS] تُحوَّل إلى ISO (صيغة قديمة، تُقرأ كاملة دائمًا)
+_DMY_SQL = """
+    SELECT substr(timestamp, 7, 4) || '-' || substr(timestamp, 4, 2) || '-'
+           || substr(timestamp, 1, 2) || substr(timestamp, 11) AS timestamp,
+           price
+    FROM DailyVariation
+    WHERE symbol = :symbol AND timestamp GLOB '[0-9][0-9]/[0-9][0-9]/[0-9][0-9][0-9][0-9]*'
+"""
+
+
+def clear_cache():
+    with _LOCK:
+        _CACHE.clear()
+
+
+def query_bars(conn, symbol, seconds, since=None):
+    """
+    حساب شموع رمز معين من القاعدة، من الأقدم للأحدث.
+    since (اختياري): بداية شمعة (YYYY-MM-DD HH:MM:SS)؛ تُحسب فقط الشموع التي تبدأ منها.
+    المقارنة على بداية الشمعة وليس على النص، حتى يبقى سجل بتاريخ فقط (2026-10-16)
+    داخل شمعة 00:00 الخاصة به.
+    """
+    iso_since = ""
+    if since:
+        # تصفية أولية على العمود الخام (نطاق على المفتاح الأساسي)؛ اليوم كاملًا لأن
+        # "2026-10-16" أصغر نصيًا من "2026-10-16 00:00:00"
+        iso_since = "AND timestamp >= :since_day"
+
+    cur = conn.execute(
+        f"""
+        WITH n AS (
+            {_ISO_SQL.format(since=iso_since)}
+            UNION ALL
+            {_DMY_SQL}
+        ),
+        t AS (
+            SELECT CAST(strftime('%s', timestamp) AS INTEGER) / :secs * :secs AS bucket,
+                   timestamp, price
+            FROM n
+        ),
+        w AS (
+            SELECT bucket,
+                   FIRST_VALUE(price) OVER win AS open,
+                   LAST_VALUE(price) OVER win AS close,
+                   MAX(price) OVER win AS high,
+                   MIN(price) OVER win AS low,
+                   COUNT(*) OVER win AS ticks
+            FROM t
+            WHERE bucket IS NOT NULL
+              AND (:since IS NULL OR bucket >= CAST(strftime('%s', :since) AS INTEGER))
+            WINDOW win AS (
+                PARTITION BY bucket ORDER BY timestamp
+                ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING
+            )
+        )
+        SELECT DISTINCT datetime(bucket, 'unixepoch') AS time, open, high, low, close, ticks
+        FROM w
+        ORDER BY time ASC
+        """,
+        {"secs": seconds, "symbol": symbol, "since": since, "since_day": since[:10] if since else None},
+    )
+    columns = [c[0] for c in cur.description]
+    return [dict(zip(columns, r)) for r in cur.fetchall()]
+
+
+def get_bars(conn, symbol, seconds):
+    """
+    إرجاع كل شموع الرمز: المغلقة من الذاكرة + ما يبدأ من الشمعة المفتوحة من القاعدة.
+    """
+    key = (symbol, seconds)
+    with _LOCK:
+        closed, open_start = _CACHE.get(key, ([], None))
+
+    fresh = query_bars(conn, symbol, seconds, since=open_start)
+
+    # كل الشموع ما عدا الأخيرة مغلقة (وصلت بعدها سجلات أحدث)
+    if len(fresh) > 1:
+        closed = closed + fresh[:-1]
+        with _LOCK:
+            _CACHE[key] = (closed, fresh[-1]["time"])
+
+    return closed + fresh[-1:]
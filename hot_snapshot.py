@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+"""
+لقطة ثنائية للقراءة فقط لنتائج الاستعلامات الأكثر طلبًا، تُقرأ عبر mmap
+حتى تتشارك كل عمليات uvicorn نسخة واحدة في page cache بدل استعلام SQLite.
+
+بنية الملف:
+- MAGIC (8 بايت) + طول الترويسة (uint64)
+- ترويسة JSON: آخر الأسعار (/company/list و /company/latest)، تقويم أيام التداول، الرموز
+- مصفوفات float64 بترتيب COLUMNS، كل عمود مصفوفة [رمز × يوم] (NaN = NULL، و present = 0 إذا لم يوجد سجل)
+
+change و volume نصوص في Company ونعيد بناءها من الأرقام؛ الرموز التي لا تعود نصوصها
+مطابقة تمامًا، أو التي تغيّر اسمها داخل النافذة، تُسجَّل في inexact ويُرجَع لها None
+حتى يستعمل main.py قاعدة SQLite.
+اللقطة لا تُكتب إذا كانت في Company تواريخ بغير صيغة YYYY-MM-DD.
+
+يكتبها update_db.py بعد كل عملية إدخال (وأيضًا main.py و snapshots.py بعد تطبيق اللقطات).
+"""
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+from array import array
+
+MAGIC = b"MASIHOT1"
+
+# عدد الأيام (التقويمية) المشمولة في مصفوفات الأسعار
+HOT_DAYS = int(os.getenv("HOT_SNAPSHOT_DAYS", "100"))
+
+COLUMNS = ("present", "price", "open", "high", "low", "change", "volume")
+
+
+def _format_change(v):
+    return f"{v:+.2f}%"
+
+
+def _format_volume(v):
+    return str(int(v))
+
+
+def _encode(text, parse, fmt):
+    """
+    تحويل نص change/volume إلى رقم. إرجاع (القيمة, مطابق) حيث "مطابق" يعني
+    أن fmt(القيمة) يعيد النص الأصلي حرفيًا.
+    """
+    if text is None:
+        return math.nan, True
+    try:
+        v = parse(text)
+    except (AttributeError, TypeError, ValueError):
+        return math.nan, False
+    if math.isnan(v) or math.isinf(v):
+        return math.nan, False
+    return v, fmt(v) == text
+
+
+def _none_if_nan(v):
+    return None if math.isnan(v) else v
+
+
+def is_stale(path, db_path):
+    """
+    True إذا لم يوجد ملف اللقطة أو كان أقدم من قاعدة البيانات.
+    """
+    try:
+        return os.stat(path).st_mtime < os.stat(db_path).st_mtime
+    except OSError:
+        return True
+
+
+def write_hot_snapshot(conn, path, days=HOT_DAYS):
+    """
+    كتابة اللقطة من القاعدة ثم استبدال الملف القديم بشكل ذري (os.replace).
+    إرجاع حجم الملف بالبايت، أو None (مع حذف أي لقطة قديمة) إذا لم يوجد جدول Company
+    بعد (قاعدة فارغة قبل أول إدخال) أو كانت التواريخ ليست ISO.
+    """
+    has_company = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'Company'"
+    ).fetchone()
+    non_iso = has_company and conn.execute(
+        "SELECT 1 FROM Company WHERE date NOT GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]' LIMIT 1"
+    ).fetchone()
+    if not has_company or non_iso:
+        # لا شيء نكتبه بعد، أو MAX(date) والمقارنات النصية لا تصلح؛ main.py يستعمل SQLite مع parse_date
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+
+    companies = [
+        dict(zip(("symbol", "name", "price", "change", "volume", "date"), r))
+        for r in conn.execute(
+            """
+            SELECT c.symbol, c.name, c.price, c.change, c.volume, c.date
+            FROM Company c
+            JOIN (
+                SELECT symbol, MAX(date) AS max_date
+                FROM Company
+                GROUP BY symbol
+            ) m ON c.symbol = m.symbol AND c.date = m.max_date
+            ORDER BY LOWER(c.name) ASC
+            """
+        )
+    ]
+
+    as_of = conn.execute("SELECT MAX(date) FROM Company").fetchone()[0]
+    window_start = None
+    calendar, symbols, names, latest_rows = [], [], {}, []
+    inexact = set()
+    data = {}
+
+    if as_of:
+        window_start = conn.execute("SELECT date(?, ?)", (as_of, f"-{days} days")).fetchone()[0]
+        rows = conn.execute(
+            """
+            SELECT symbol, name, price, open, high, low, change, volume, date
+            FROM Company
+            WHERE date >= ?
+            ORDER BY symbol, date
+            """,
+            (window_start,),
+        ).fetchall()
+
+        calendar = sorted({r[8] for r in rows})
+        symbols = sorted({r[0] for r in rows})
+        day_idx = {d: i for i, d in enumerate(calendar)}
+        sym_idx = {s: i for i, s in enumerate(symbols)}
+        n_days = len(calendar)
+
+        data = {c: array("d", [math.nan]) * (len(symbols) * n_days) for c in COLUMNS}
+        for symbol, name, price, open_p, high_p, low_p, change, volume, date in rows:
+            k = sym_idx[symbol] * n_days + day_idx[date]
+            change_v, change_ok = _encode(change, lambda t: float(t.rstrip("%")), _format_change)
+            volume_v, volume_ok = _encode(volume, float, _format_volume)
+            # الاسم محفوظ مرة واحدة لكل رمز: رمز غيّر اسمه داخل النافذة يُقرأ من SQLite
+            if not (change_ok and volume_ok) or names.get(symbol, name) != name:
+                inexact.add(symbol)
+            values = (1.0, price, open_p, high_p, low_p, change_v, volume_v)
+            for col, v in zip(COLUMNS, values):
+                data[col][k] = math.nan if v is None else v
+            names[symbol] = name
+            if date == as_of:
+                latest_rows.append({
+                    "symbol": symbol, "name": name, "price": price,
+                    "change": change, "volume": volume, "date": date,
+                })
+
+    header = json.dumps({
+        "byteorder": sys.byteorder,
+        "as_of": as_of,
+        "window_start": window_start,
+        "calendar": calendar,
+        "symbols": symbols,
+        "names": names,
+        "inexact": sorted(inexact),
+        "companies": companies,
+        "latest": latest_rows,
+    }, ensure_ascii=False).encode("utf-8")
+
+    # محاذاة بداية المصفوفات على 8 بايت
+    prefix = len(MAGIC) + 8 + len(header)
+    padding = b"\0" * (-prefix % 8)
+
+    # ملف مؤقت خاص بكل عملية في نفس المجلد (عدة عمّال قد يكتبون معًا)
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + ".", dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<Q", len(header)))
+            f.write(header)
+            f.write(padding)
+            for col in COLUMNS:
+                if col in data:
+                    data[col].tofile(f)
+        # mkstemp ينشئ الملف بصلاحيات 0600
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+    return os.path.getsize(path)
+
+
+class HotSnapshot:
+    """
+    قارئ اللقطة: الترويسة تُحلَّل مرة واحدة، والمصفوفات تُقرأ مباشرة من mmap.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.stat = os.fstat(f.fileno())
+
+        if self._mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"ملف لقطة غير صالح: {path}")
+        (header_len,) = struct.unpack_from("<Q", self._mm, len(MAGIC))
+        start = len(MAGIC) + 8
+        header = json.loads(self._mm[start:start + header_len].decode("utf-8"))
+        if header["byteorder"] != sys.byteorder:
+            raise ValueError("ترتيب البايتات في اللقطة لا يطابق هذا الجهاز")
+
+        self.as_of = header["as_of"]
+        self.window_start = header["window_start"]
+        self.calendar = header["calendar"]
+        self.symbols = {s: i for i, s in enumerate(header["symbols"])}
+        self.names = header["names"]
+        self.inexact = set(header["inexact"])
+        self.companies = header["companies"]
+        self.latest = header["latest"]
+
+        offset = start + header_len
+        offset += -offset % 8
+        size = len(self.calendar) * len(self.symbols)
+        values = memoryview(self._mm)[offset:offset + size * 8 * len(COLUMNS)].cast("d")
+        self.columns = {c: values[i * size:(i + 1) * size] for i, c in enumerate(COLUMNS)}
+
+    def history(self, symbol, first_day):
+        """
+        سجلات رمز معين من اليوم رقم first_day في calendar حتى آخر يوم، من الأحدث للأقدم
+        وبنفس حقول جدول Company. إرجاع None إذا لم تكن نصوص change/volume للرمز
+        قابلة لإعادة البناء حرفيًا أو تغيّر اسمه في النافذة (على المستدعي استعمال SQLite).
+        """
+        if symbol in self.inexact:
+            return None
+        i = self.symbols.get(symbol)
+        if i is None:
+            return []
+        n_days = len(self.calendar)
+        base = i * n_days
+        col = self.columns
+
+        rows = []
+        for j in range(n_days - 1, first_day - 1, -1):
+            k = base + j
+            if math.isnan(col["present"][k]):
+                continue
+            change = col["change"][k]
+            volume = col["volume"][k]
+            rows.append({
+                "symbol": symbol,
+                "name": self.names.get(symbol),
+                "price": _none_if_nan(col["price"][k]),
+                "open": _none_if_nan(col["open"][k]),
+                "high": _none_if_nan(col["high"][k]),
+                "low": _none_if_nan(col["low"][k]),
+                "change": None if math.isnan(change) else _format_change(change),
+                "volume": None if math.isnan(volume) else _format_volume(volume),
+                "date": self.calendar[j],
+            })
+        return rows
+
+
+_CURRENT = None
+_LOCK = threading.Lock()
+
+
+def get_hot_snapshot(path, db_path):
+    """
+    إرجاع اللقطة المفتوحة (وإعادة فتحها إذا استُبدل الملف)،
+    أو None إذا لم توجد أو كانت أقدم من قاعدة البيانات.
+    """
+    global _CURRENT
+    if is_stale(path, db_path):
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+
+    current = _CURRENT
+    if current is None or (current.stat.st_ino, current.stat.st_mtime_ns) != (st.st_ino, st.st_mtime_ns):
+        with _LOCK:
+            current = _CURRENT
+            if current is None or (current.stat.st_ino, current.stat.st_mtime_ns) != (st.st_ino, st.st_mtime_ns):
+                try:
+                    current = HotSnapshot(path)
+                except (OSError, ValueError):
+                    return None
+                _CURRENT = current
+    return current
@@ -2,20 +2,33 @@
 import os
 import sqlite3
 from datetime import datetime, timedelta
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.openapi.utils import get_openapi
-from fastapi.responses import FileResponse
-import json
+from fastapi.openapi.docs import get_redoc_html, get_swagger_ui_html
+import bars
+import hot_snapshot
+import openapi_docs
+from periods import PERIOD_DAYS
+import snapshots
+from admission import AdmissionMiddleware
 
 DB_PATH = os.getenv("DB_PATH", "./stocks_morocco.db")
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "./snapshots")
+HOT_SNAPSHOT_PATH = os.getenv("HOT_SNAPSHOT_PATH", os.path.splitext(DB_PATH)[0] + ".hot")
 
 app = FastAPI(
     title="Morocco Market API",
     description="API لقراءة بيانات البورصة المغربية من جدول Company و DailyVariation.",
-    version="2.0.0"
+    version="2.0.0",
+    # نخدم /openapi.json و /docs و /redoc بأنفسنا من المخطط المجمّد في الذاكرة (انظر openapi_docs.py)
+    openapi_url=None,
+    docs_url=None,
+    redoc_url=None,
 )
 
+# التحكم في القبول وتحديد المعدل لكل عميل (انظر admission.py)
+app.add_middleware(AdmissionMiddleware)
+
 # السماح بالوصول من أي origin
 app.add_middleware(
     CORSMiddleware,
@@ -91,17 +104,48 @@ def sort_desc_by_date(rows, key_field="date"):
 
 def period_to_days(period: str):
     """
-    تحويل الفترة النصية إلى عدد أيام
+    تحويل الفترة النصية إلى عدد أيام (القائمة في periods.py)
+    """
+    return PERIOD_DAYS.get(period.lower())
+
+
+def interval_to_seconds(interval: str):
+    """
+    تحويل فاصل الشموع النصي إلى عدد ثوانٍ
     """
     mapping = {
-        "week": 7,
-        "month": 30,
-        "3months": 90,
-        "6months": 180,
-        "year": 365,
-        "3years": 365 * 3
+        "1m": 60,
+        "5m": 300,
+        "15m": 900,
+        "1h": 3600,
     }
-    return mapping.get(period.lower())
+    return mapping.get(interval.lower())
+
+
+def load_snapshots():
+    """
+    تطبيق لقطات SNAPSHOT_DIR (الأساسية + الفروقات) غير المطبّقة بعد على القاعدة المحلية.
+    """
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        applied = snapshots.apply_snapshots(conn, SNAPSHOT_DIR)
+        if applied:
+            bars.clear_cache()
+        # إعادة كتابة لقطة mmap إذا كانت أقدم من القاعدة (مثلًا بعد تطبيق اللقطات خارج الـ API)
+        if applied or hot_snapshot.is_stale(HOT_SNAPSHOT_PATH, DB_PATH):
+            hot_snapshot.write_hot_snapshot(conn, HOT_SNAPSHOT_PATH)
+        return applied
+    finally:
+        conn.close()
+
+
+@app.on_event("startup")
+def apply_snapshots_on_startup():
+    # مزامنة القاعدة المحلية من اللقطات عند بدء التشغيل (إن وُجدت).
+    # apply_snapshots تُسلسل العمّال بقفل الكتابة، ولتجنّب الانتظار يمكن تشغيل
+    # "python snapshots.py apply" مرة واحدة قبل تشغيل uvicorn.
+    if os.path.exists(os.path.join(SNAPSHOT_DIR, "manifest.json")):
+        load_snapshots()
 
 
 # ---------------------------- 1) Health ---------------------------- #
@@ -128,6 +172,11 @@ def list_companies():
     if not os.path.exists(DB_PATH):
         raise HTTPException(500, "قاعدة البيانات غير موجودة.")
 
+    # الرد من لقطة mmap المشتركة إن كانت متوفرة وحديثة
+    hot = hot_snapshot.get_hot_snapshot(HOT_SNAPSHOT_PATH, DB_PATH)
+    if hot is not None:
+        return {"count": len(hot.companies), "companies": hot.companies}
+
     conn = get_conn()
     cur = conn.cursor()
 
@@ -161,6 +210,10 @@ def latest_day():
     if not os.path.exists(DB_PATH):
         raise HTTPException(500, "قاعدة البيانات غير موجودة")
 
+    hot = hot_snapshot.get_hot_snapshot(HOT_SNAPSHOT_PATH, DB_PATH)
+    if hot is not None:
+        return {"date": hot.as_of, "count": len(hot.latest), "rows": hot.latest}
+
     conn = get_conn()
     cur = conn.execute("SELECT DISTINCT date FROM Company")
     dates = [r[0] for r in cur.fetchall()]
@@ -244,6 +297,17 @@ def range_period(
 
     date_limit = datetime.today() - timedelta(days=days)
 
+    # الفترات القصيرة التي تغطيها لقطة mmap لا تحتاج SQLite
+    hot = hot_snapshot.get_hot_snapshot(HOT_SNAPSHOT_PATH, DB_PATH)
+    if hot is not None and hot.window_start and parse_date(hot.window_start) <= date_limit:
+        first_day = next(
+            (i for i, d in enumerate(hot.calendar) if parse_date(d) >= date_limit),
+            len(hot.calendar),
+        )
+        rows = hot.history(symbol, first_day)
+        if rows is not None:
+            return {"symbol": symbol, "period": period, "count": len(rows), "rows": rows}
+
     conn = get_conn()
     cur = conn.execute("SELECT * FROM Company WHERE symbol=?", (symbol,))
     rows = [dict(r) for r in cur.fetchall()]
@@ -311,6 +375,52 @@ def all_data():
     return {"count": len(rows_sorted), "rows": rows_sorted}
 
 
+# ---------------------------- 8) أداء جميع الشركات لكل الفترات ---------------------------- #
+
+
+@app.get("/company/performance")
+def performance_grid():
+    """
+    إرجاع جدول أداء السوق كاملًا (العائد، أعلى/أدنى سعر، متوسط الحجم)
+    لكل رمز ولكل فترة من period_to_days.
+    القيم محسوبة مسبقًا في جدول CompanyPerformance أثناء تشغيل update_db.py (انظر performance.py).
+    return_pct يكون null إذا لم يغطِّ تاريخ الرمز الفترة كاملة (رمز أُدرج بعد بدايتها
+    أو لا سجل له في as_of)؛ start_date و end_date يبيّنان الأيام المحسوبة فعلًا.
+    """
+    if not os.path.exists(DB_PATH):
+        raise HTTPException(500, "قاعدة البيانات غير موجودة.")
+
+    conn = get_conn()
+    try:
+        cur = conn.execute(
+            """
+            SELECT symbol, name, period, days, start_date, start_price, end_date, end_price,
+                   return_pct, high, low, avg_volume, as_of
+            FROM CompanyPerformance
+            ORDER BY symbol, period
+            """
+        )
+    except sqlite3.OperationalError:
+        raise HTTPException(503, "جدول الأداء غير موجود بعد. قم بتشغيل update_db.py")
+
+    companies = {}
+    as_of = None
+    for r in cur.fetchall():
+        row = dict(r)
+        symbol = row.pop("symbol")
+        name = row.pop("name")
+        period = row.pop("period")
+        as_of = row.pop("as_of")
+        entry = companies.setdefault(symbol, {"symbol": symbol, "name": name, "performance": {}})
+        entry["performance"][period] = row
+
+    # القراءة مرتبة حسب المفتاح الأساسي (symbol, period)؛ نرتب الفترات من الأقصر للأطول هنا
+    for entry in companies.values():
+        entry["performance"] = dict(sorted(entry["performance"].items(), key=lambda kv: kv[1]["days"]))
+
+    return {"as_of": as_of, "count": len(companies), "companies": list(companies.values())}
+
+
 # ==================== نقاط نهاية جديدة للعمل على DailyVariation ==================== #
 
 
@@ -403,6 +513,41 @@ def variation_recent(symbol: str = Query(...), limit: int = Query(50, ge=1, le=1
     rows_sorted = sort_desc_by_date(rows, key_field="timestamp")
     return {"symbol": symbol, "limit": limit, "count": len(rows_sorted), "rows": rows_sorted}
 
+
+@app.get("/variation/bars")
+def variation_bars(
+    symbol: str = Query(...),
+    interval: str = Query("5m", description="1m, 5m, 15m, 1h"),
+    date_from: str = None,
+    limit: int = Query(500, ge=1, le=5000),
+):
+    """
+    إرجاع شموع OHLC لرمز معين محسوبة من سجلات DailyVariation حسب الفاصل الزمني.
+    الشموع المغلقة تُحفظ في الذاكرة ولا يُعاد حساب إلا الشمعة الأخيرة (المفتوحة) (انظر bars.py).
+    النتيجة آخر limit شمعة (اختياريًا ابتداءً من date_from بصيغة YYYY-MM-DD أو DD/MM/YYYY)
+    مرتبة من الأقدم للأحدث لتناسب الرسوم البيانية.
+    """
+    if not os.path.exists(DB_PATH):
+        raise HTTPException(500, "قاعدة البيانات غير موجودة.")
+
+    seconds = interval_to_seconds(interval)
+    if not seconds:
+        raise HTTPException(400, "الفاصل الزمني غير صحيح.")
+
+    dt_from = parse_date(date_from) if date_from else None
+    if date_from and not dt_from:
+        raise HTTPException(400, "التاريخ غير صحيح.")
+
+    conn = get_conn()
+    rows = bars.get_bars(conn, symbol, seconds)
+
+    if dt_from:
+        start = dt_from.strftime("%Y-%m-%d %H:%M:%S")
+        rows = [b for b in rows if b["time"] >= start]
+    rows = rows[-limit:]
+
+    return {"symbol": symbol, "interval": interval.lower(), "count": len(rows), "bars": rows}
+
 # ---------------------------- 3)قائمة الرموز الشركات ---------------------------- #
 
 @app.get("/variation/symbols")
@@ -459,26 +604,40 @@ def openapi_samples():
 @app.get("/export/openapi")
 def export_openapi():
     """
-    تصدير ملف OpenAPI JSON كامل للتوثيق
+    توليد مخطط OpenAPI (مرة واحدة لكل عملية) وإرجاع روابط تنزيله مع ETag لكل نسخة
     """
-    schema = get_openapi(
-        title=app.title,
-        version=app.version,
-        description=app.description,
-        routes=app.routes,
-    )
-
-    with open("openapi.json", "w", encoding="utf-8") as f:
-        json.dump(schema, f, ensure_ascii=False, indent=2)
-
-    return {"status": "generated", "file": "openapi.json", "download_url": "/openapi.json"}
+    documents = openapi_docs.get_documents(app)
+    return {
+        "status": "generated",
+        "download_url": "/openapi.json",
+        "variants": {
+            lang: {"url": "/openapi.json" if lang == "default" else f"/openapi.json?lang={lang}", "etag": etag}
+            for lang, (_, etag) in documents.items()
+        },
+    }
 
 
-@app.get("/openapi.json")
-def serve_openapi_file():
+@app.get("/openapi.json", include_in_schema=False)
+def serve_openapi(request: Request, lang: str = Query("default", description="default, en, ar")):
     """
-    تنزيل ملف OpenAPI JSON الذي تم توليده
+    خدمة مخطط OpenAPI من الذاكرة مع دعم ETag / If-None-Match
     """
-    if not os.path.exists("openapi.json"):
-        raise HTTPException(404, "الملف غير موجود. قم بتوليده عبر /export/openapi")
-    return FileResponse("openapi.json", media_type="application/json")
+    documents = openapi_docs.get_documents(app)
+    if lang not in documents:
+        raise HTTPException(400, "اللغة غير صحيحة.")
+
+    body, etag = documents[lang]
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=3600"}
+    if openapi_docs.etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@app.get("/docs", include_in_schema=False)
+def swagger_docs():
+    return get_swagger_ui_html(openapi_url="/openapi.json", title=app.title + " - Swagger UI")
+
+
+@app.get("/redoc", include_in_schema=False)
+def redoc_docs():
+    return get_redoc_html(openapi_url="/openapi.json", title=app.title + " - ReDoc")
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+بناء مخطط OpenAPI مرة واحدة (عند أول طلب) ثم الاحتفاظ به مجمّدًا في الذاكرة
+مع نسختيه الإنجليزية والعربية، كل نسخة مسلسلة مسبقًا ومعها ETag.
+يستعمله main.py لخدمة /openapi.json و scripts/export_openapi.py لتصدير الملفات.
+"""
+import hashlib
+import json
+import re
+import threading
+
+from fastapi.openapi.utils import get_openapi
+
+# ميتاداتا النسخ المترجمة (العنوان والوصف فقط، باقي المخطط مشترك)
+VARIANTS = {
+    "en": {
+        "title": "Morocco Market API – English",
+        "description": (
+            "OpenAPI specification for Morocco Market API (Company table only).\n\n"
+            "Features:\n"
+            "- Alphabetical company list\n"
+            "- Latest trading day snapshot\n"
+            "- Symbol range queries (week, month, 3/6 months, year, 3 years)\n"
+            "- All results sorted from newest to oldest\n"
+        ),
+    },
+    "ar": {
+        "title": "واجهة سوق المغرب – العربية",
+        "description": (
+            "مخطط OpenAPI لواجهة سوق المغرب (الاعتماد على جدول Company فقط).\n\n"
+            "الميزات:\n"
+            "- قائمة الشركات مرتبة أبجديًا\n"
+            "- أحدث يوم تداول في القاعدة\n"
+            "- استعلامات فترات جاهزة (أسبوع، شهر، 3/6 أشهر، سنة، 3 سنوات)\n"
+            "- النتائج دائمًا من الأحدث إلى الأقدم\n"
+        ),
+    },
+}
+
+_DOCUMENTS = None
+_LOCK = threading.Lock()
+
+# عناصر ترويسة If-None-Match: * أو "..." أو W/"..." مفصولة بفواصل
+_ETAG_RE = re.compile(r'\*|(?:W/)?"[^"]*"')
+
+
+def build_schemas(app):
+    """
+    بناء المخطط الأساسي ونسخه المترجمة. إرجاع {"default": ..., "en": ..., "ar": ...}.
+    النسخ تشترك في paths/components ولا تختلف إلا في info.
+    """
+    base = get_openapi(
+        title=app.title,
+        version=app.version,
+        description=app.description,
+        routes=app.routes,
+    )
+    schemas = {"default": base}
+    for lang, meta in VARIANTS.items():
+        schemas[lang] = dict(base, info=dict(base["info"], **meta))
+    return schemas
+
+
+def get_documents(app):
+    """
+    إرجاع {lang: (body, etag)} بعد بنائها مرة واحدة فقط لكل عملية.
+    """
+    global _DOCUMENTS
+    if _DOCUMENTS is None:
+        with _LOCK:
+            if _DOCUMENTS is None:
+                documents = {}
+                for lang, schema in build_schemas(app).items():
+                    body = json.dumps(schema, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+                    etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+                    documents[lang] = (body, etag)
+                _DOCUMENTS = documents
+    return _DOCUMENTS
+
+
+def etag_matches(if_none_match, etag):
+    """
+    هل تطابق ترويسة If-None-Match الـ ETag؟ المقارنة ضعيفة (W/ يُتجاهل) كما في RFC 9110،
+    و * تطابق أي نسخة.
+    """
+    if not if_none_match:
+        return False
+    for tag in _ETAG_RE.findall(if_none_match):
+        if tag == "*" or tag.removeprefix("W/") == etag.removeprefix("W/"):
+            return True
+    return False
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+حساب جدول CompanyPerformance (يستعمله update_db.py، ويقرؤه main.py في /company/performance).
+
+لكل رمز ولكل فترة في PERIOD_DAYS: أول وآخر سعر في الفترة، العائد بينهما، أعلى/أدنى سعر
+(القيم 0 تُتجاهل)، ومتوسط الحجم.
+return_pct يكون NULL إذا لم يغطِّ تاريخ الرمز الفترة كاملة:
+- أول يوم للرمز في الفترة بعد أول يوم تداول للسوق فيها (رمز أُدرج حديثًا أو بيانات ناقصة)،
+  أو القاعدة نفسها لا تبدأ قبل بداية الفترة + START_GRACE_DAYS؛
+- أو آخر يوم للرمز قبل as_of (رمز موقوف أو مشطوب).
+باقي الحقول تبقى محسوبة على الأيام المتوفرة.
+"""
+from periods import PERIOD_DAYS
+
+# أول يوم تداول في الفترة قد يتأخر عن بدايتها (عطلة نهاية الأسبوع، الأعياد)
+START_GRACE_DAYS = 7
+
+
+def refresh_performance(cur, as_of_date):
+    """
+    إعادة حساب جدول CompanyPerformance حتى تاريخ as_of_date.
+    يُستدعى داخل نفس معاملة الإدخال حتى يبقى الجدول متسقًا مع Company.
+    إرجاع عدد الصفوف المكتوبة.
+    """
+    periods_sql = ", ".join(f"(:period{i}, :days{i})" for i in range(len(PERIOD_DAYS)))
+    params = {"as_of": as_of_date}
+    for i, (period, days) in enumerate(PERIOD_DAYS.items()):
+        params[f"period{i}"] = period
+        params[f"days{i}"] = days
+
+    cur.execute("DELETE FROM CompanyPerformance")
+    cur.execute(f"""
+        INSERT INTO CompanyPerformance (
+            symbol, name, period, days, start_date, start_price, end_date, end_price,
+            return_pct, high, low, avg_volume, as_of
+        )
+        WITH periods(period, days) AS (VALUES {periods_sql}),
+        agg AS (
+            SELECT p.period, p.days, c.symbol,
+                   MIN(c.date) AS start_date,
+                   MAX(c.date) AS end_date,
+                   MAX(NULLIF(c.high, 0)) AS high,
+                   MIN(NULLIF(c.low, 0)) AS low,
+                   AVG(CAST(c.volume AS REAL)) AS avg_volume
+            FROM periods p
+            JOIN Company c
+              ON c.date >= date(:as_of, '-' || p.days || ' days') AND c.date <= :as_of
+            GROUP BY p.period, c.symbol
+        ),
+        market AS (
+            SELECT period, MIN(start_date) AS start_date
+            FROM agg
+            GROUP BY period
+        )
+        SELECT a.symbol, e.name, a.period, a.days,
+               a.start_date, s.price, a.end_date, e.price,
+               CASE
+                   WHEN s.price > 0
+                    AND a.start_date = m.start_date
+                    AND m.start_date <= date(:as_of, '-' || a.days || ' days', '+{START_GRACE_DAYS} days')
+                    AND a.end_date = :as_of
+                   THEN (e.price - s.price) / s.price * 100
+               END,
+               a.high, a.low, a.avg_volume, :as_of
+        FROM agg a
+        JOIN market m ON m.period = a.period
+        JOIN Company s ON s.symbol = a.symbol AND s.date = a.start_date
+        JOIN Company e ON e.symbol = a.symbol AND e.date = a.end_date
+    """, params)
+    return cur.rowcount
@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+"""
+قائمة الفترات المشتركة بين main.py (period_to_days) و performance.py (جدول CompanyPerformance).
+"""
+
+PERIOD_DAYS = {
+    "week": 7,
+    "month": 30,
+    "3months": 90,
+    "6months": 180,
+    "year": 365,
+    "3years": 365 * 3
+}
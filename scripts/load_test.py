@@ -0,0 +1,145 @@
+# scripts/load_test.py
+# -*- coding: utf-8 -*-
+"""
+مولّد حمل محلي لقياس أثر التحكم في القبول (admission.py).
+
+المرحلة 1: طلبات خفيفة ومتوسطة فقط (خط الأساس)، ومنها /company/range.
+المرحلة 2: نفس الطلبات الخفيفة مع إغراق المسار الثقيل (/company/all) من عدة عملاء.
+في الحالتين نطبع p50/p95/p99 لزمن الطلبات الخفيفة وتوزيع رموز الحالة.
+
+تحديد المعدل معطّل افتراضيًا. لاختباره معه (RATE_LIMIT_RPS) يرسل كل عميل مفتاحه في
+X-API-Key (cheap-0 ... heavy-N)، والخادم لا يقبل إلا المفاتيح المعرّفة في API_KEYS،
+وإلا تشترك كل العملاء المحليين في دلو عنوان IP نفسه.
+
+الاستعمال:
+    uvicorn main:app --port 8000
+    # أو مع تحديد المعدل:
+    # RATE_LIMIT_RPS=10 API_KEYS=$(python scripts/load_test.py --print-keys) uvicorn main:app --port 8000
+    python scripts/load_test.py --base-url http://localhost:8000 --duration 15
+"""
+import argparse
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))
+    return values[k]
+
+
+def worker(base_url, paths, api_key, interval, stop, latencies, statuses, lock):
+    i = 0
+    while not stop.is_set():
+        path = paths[i % len(paths)]
+        i += 1
+        req = urllib.request.Request(base_url + path, headers={"X-API-Key": api_key})
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=30) as resp:
+                resp.read()
+                status = resp.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+            if status in (429, 503):
+                # احترام Retry-After بشكل مختصر حتى لا ندور في حلقة فارغة
+                time.sleep(min(float(e.headers.get("Retry-After", "1")), 0.5))
+        except Exception:
+            status = "error"
+        elapsed = (time.perf_counter() - start) * 1000
+        with lock:
+            statuses[status] += 1
+            if status == 200:
+                latencies.append(elapsed)
+        if interval:
+            time.sleep(max(0.0, interval - elapsed / 1000))
+
+
+def run_phase(args, heavy):
+    stop = threading.Event()
+    lock = threading.Lock()
+    cheap_lat, cheap_st = [], Counter()
+    heavy_lat, heavy_st = [], Counter()
+    threads = []
+
+    for i in range(args.cheap_clients):
+        threads.append(threading.Thread(
+            target=worker,
+            args=(args.base_url, args.cheap_path, f"cheap-{i}", 1.0 / args.cheap_rps,
+                  stop, cheap_lat, cheap_st, lock),
+        ))
+    if heavy:
+        for i in range(args.heavy_clients):
+            threads.append(threading.Thread(
+                target=worker,
+                args=(args.base_url, [args.heavy_path], f"heavy-{i}", 0,
+                      stop, heavy_lat, heavy_st, lock),
+            ))
+
+    for t in threads:
+        t.start()
+    time.sleep(args.duration)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    return cheap_lat, cheap_st, heavy_lat, heavy_st
+
+
+def report(title, latencies, statuses):
+    print(f"  {title}: n={len(latencies)} "
+          f"p50={percentile(latencies, 50):.1f}ms "
+          f"p95={percentile(latencies, 95):.1f}ms "
+          f"p99={percentile(latencies, 99):.1f}ms "
+          f"statuses={dict(statuses)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test for Morocco Market API admission control")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per phase")
+    parser.add_argument("--cheap-clients", type=int, default=4)
+    parser.add_argument("--heavy-clients", type=int, default=16)
+    parser.add_argument("--cheap-rps", type=float, default=5.0,
+                        help="requests per second per cheap client (below the per-client rate limit)")
+    parser.add_argument("--cheap-path", action="append",
+                        help="cheap endpoint(s), default: /variation/latest, /company/performance "
+                             "and /company/range for --symbol")
+    parser.add_argument("--symbol", default="ADH", help="symbol for the default /company/range path")
+    parser.add_argument("--heavy-path", default="/company/all")
+    parser.add_argument("--print-keys", action="store_true",
+                        help="print the client keys (for the server's API_KEYS) and exit")
+    args = parser.parse_args()
+    if args.print_keys:
+        keys = [f"cheap-{i}" for i in range(args.cheap_clients)]
+        keys += [f"heavy-{i}" for i in range(args.heavy_clients)]
+        print(",".join(keys))
+        return
+    if not args.cheap_path:
+        args.cheap_path = [
+            "/variation/latest",
+            "/company/performance",
+            f"/company/range?symbol={args.symbol}&period=month",
+        ]
+
+    print(f"▶ Phase 1: cheap only ({args.cheap_clients} clients, {args.duration}s)")
+    cheap_lat, cheap_st, _, _ = run_phase(args, heavy=False)
+    report("cheap", cheap_lat, cheap_st)
+
+    print(f"▶ Phase 2: cheap + heavy flood ({args.heavy_clients} clients on {args.heavy_path})")
+    cheap_lat2, cheap_st2, heavy_lat, heavy_st = run_phase(args, heavy=True)
+    report("cheap", cheap_lat2, cheap_st2)
+    report("heavy", heavy_lat, heavy_st)
+
+    base, flood = percentile(cheap_lat, 99), percentile(cheap_lat2, 99)
+    ratio = flood / base if base else 0.0
+    print(f"\ncheap p99: {base:.1f}ms -> {flood:.1f}ms (x{ratio:.2f})")
+
+
+if __name__ == "__main__":
+    main()
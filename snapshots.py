@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+"""
+توزيع قاعدة البيانات على شكل لقطات مضغوطة بدل رفع ملف stocks_morocco.db كاملًا.
+
+البنية داخل SNAPSHOT_DIR:
+- objects/<sha256>.json.gz : لقطات مضغوطة، اسم الملف هو بصمة محتواه (content-addressed).
+- manifest.json            : اللقطة الأساسية (base) الحالية + قائمة الفروقات اليومية (deltas) بالترتيب.
+
+اللقطة الأساسية تحتوي على مخطط الجداول وجميع السجلات،
+والفرق اليومي يحتوي فقط على سجلات Company و DailyVariation الجديدة
+بالإضافة لجدول CompanyPerformance كاملًا (صغير ويُعاد حسابه كل يوم).
+"""
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime
+
+# الجداول المشمولة في اللقطات
+SNAPSHOT_TABLES = ("Company", "DailyVariation", "CompanyPerformance")
+
+# عدد الفروقات قبل إنشاء لقطة أساسية جديدة
+BASE_EVERY = int(os.getenv("SNAPSHOT_BASE_EVERY", "20"))
+
+# مدة انتظار قفل الكتابة (بالثواني) عندما تطبّق عدة عمليات اللقطات على نفس القاعدة
+LOCK_TIMEOUT = float(os.getenv("SNAPSHOT_LOCK_TIMEOUT", "300"))
+
+
+def ensure_state_table(conn):
+    # سجل اللقطات المطبّقة على القاعدة المحلية
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS "SnapshotApplied" (
+            "sha256"     TEXT PRIMARY KEY,
+            "kind"       TEXT NOT NULL,
+            "applied_at" TEXT NOT NULL
+        )
+    """)
+
+
+def read_manifest(snapshot_dir):
+    path = os.path.join(snapshot_dir, "manifest.json")
+    if not os.path.exists(path):
+        return {"base": None, "deltas": []}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_manifest(snapshot_dir, manifest):
+    path = os.path.join(snapshot_dir, "manifest.json")
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def _dump_table(conn, table, where="", params=()):
+    cur = conn.execute(f'SELECT * FROM "{table}" {where}', params)
+    columns = [c[0] for c in cur.description]
+    return {"columns": columns, "rows": [list(r) for r in cur.fetchall()]}
+
+
+def _write_object(snapshot_dir, payload):
+    """
+    ضغط الحمولة وحفظها باسم بصمتها. mtime=0 حتى يكون الناتج ثابتًا لنفس المحتوى.
+    """
+    raw = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    blob = gzip.compress(raw, compresslevel=9, mtime=0)
+    sha = hashlib.sha256(blob).hexdigest()
+
+    objects_dir = os.path.join(snapshot_dir, "objects")
+    os.makedirs(objects_dir, exist_ok=True)
+    path = os.path.join(objects_dir, f"{sha}.json.gz")
+    if not os.path.exists(path):
+        with open(path, "wb") as f:
+            f.write(blob)
+    return sha, len(blob)
+
+
+def _read_object(snapshot_dir, sha):
+    path = os.path.join(snapshot_dir, "objects", f"{sha}.json.gz")
+    with open(path, "rb") as f:
+        blob = f.read()
+    if hashlib.sha256(blob).hexdigest() != sha:
+        raise ValueError(f"بصمة اللقطة غير مطابقة: {sha}")
+    return json.loads(gzip.decompress(blob).decode("utf-8"))
+
+
+def _mark_applied(conn, sha, kind):
+    conn.execute(
+        "INSERT OR REPLACE INTO SnapshotApplied (sha256, kind, applied_at) VALUES (?, ?, ?)",
+        (sha, kind, datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+    )
+
+
+def _prune_objects(snapshot_dir, manifest):
+    # حذف اللقطات التي لم تعد مذكورة في manifest
+    keep = {e["sha256"] for e in manifest["deltas"]}
+    if manifest["base"]:
+        keep.add(manifest["base"]["sha256"])
+    objects_dir = os.path.join(snapshot_dir, "objects")
+    for name in os.listdir(objects_dir):
+        if name.endswith(".json.gz") and name[: -len(".json.gz")] not in keep:
+            os.remove(os.path.join(objects_dir, name))
+
+
+def write_snapshot(conn, snapshot_dir, current_date, current_ts):
+    """
+    كتابة لقطة جديدة بعد عملية الإدخال:
+    - لقطة أساسية كاملة إذا لم توجد واحدة أو بلغ عدد الفروقات BASE_EVERY.
+    - وإلا فرق يومي بسجلات current_date / current_ts فقط.
+    إرجاع (kind, sha256, size).
+    """
+    ensure_state_table(conn)
+    manifest = read_manifest(snapshot_dir)
+    entry = {"date": current_date, "created": current_ts}
+
+    if manifest["base"] is None or len(manifest["deltas"]) >= BASE_EVERY:
+        kind = "base"
+        marks = ", ".join("?" for _ in SNAPSHOT_TABLES)
+        schema = [
+            r[0] for r in conn.execute(
+                f"""
+                SELECT sql FROM sqlite_master
+                WHERE tbl_name IN ({marks}) AND sql IS NOT NULL
+                ORDER BY type = 'index'
+                """,
+                SNAPSHOT_TABLES,
+            )
+        ]
+        payload = {
+            "kind": kind,
+            "date": current_date,
+            "schema": schema,
+            "tables": {t: _dump_table(conn, t) for t in SNAPSHOT_TABLES},
+        }
+        sha, size = _write_object(snapshot_dir, payload)
+        manifest = {"base": dict(entry, sha256=sha), "deltas": []}
+    else:
+        kind = "delta"
+        payload = {
+            "kind": kind,
+            "date": current_date,
+            "upsert": {
+                "Company": _dump_table(conn, "Company", "WHERE date = ?", (current_date,)),
+                "DailyVariation": _dump_table(conn, "DailyVariation", "WHERE timestamp = ?", (current_ts,)),
+            },
+            "replace": {
+                "CompanyPerformance": _dump_table(conn, "CompanyPerformance"),
+            },
+        }
+        sha, size = _write_object(snapshot_dir, payload)
+        manifest["deltas"].append(dict(entry, sha256=sha))
+
+    write_manifest(snapshot_dir, manifest)
+    _prune_objects(snapshot_dir, manifest)
+
+    # القاعدة المحلية متطابقة مسبقًا مع ما كُتب
+    if kind == "base":
+        conn.execute("DELETE FROM SnapshotApplied")
+    _mark_applied(conn, sha, kind)
+    conn.commit()
+    return kind, sha, size
+
+
+def _insert_rows(conn, table, data, verb="INSERT OR REPLACE"):
+    if not data["rows"]:
+        return 0
+    cols = ", ".join(f'"{c}"' for c in data["columns"])
+    marks = ", ".join("?" for _ in data["columns"])
+    conn.executemany(f'{verb} INTO "{table}" ({cols}) VALUES ({marks})', data["rows"])
+    return len(data["rows"])
+
+
+def _applied_shas(conn):
+    try:
+        return {r[0] for r in conn.execute("SELECT sha256 FROM SnapshotApplied")}
+    except sqlite3.OperationalError:
+        # الجدول غير موجود بعد
+        return set()
+
+
+def apply_snapshots(conn, snapshot_dir):
+    """
+    تطبيق اللقطات غير المطبّقة بعد على القاعدة المحلية داخل معاملة واحدة.
+    إذا تغيّرت اللقطة الأساسية يُعاد بناء الجداول منها ثم تُطبّق الفروقات بالترتيب.
+    عدة عمليات (مثل عمّال uvicorn) يمكنها استدعاء الدالة معًا: الأولى تأخذ قفل الكتابة
+    (BEGIN IMMEDIATE) والباقي ينتظر ثم لا يجد ما يطبّقه.
+    إرجاع عدد اللقطات المطبّقة.
+    """
+    manifest = read_manifest(snapshot_dir)
+    if manifest["base"] is None:
+        return 0
+
+    wanted = {manifest["base"]["sha256"]} | {e["sha256"] for e in manifest["deltas"]}
+    if wanted <= _applied_shas(conn):
+        return 0
+
+    conn.execute(f"PRAGMA busy_timeout = {int(LOCK_TIMEOUT * 1000)}")
+    # معاملة كتابة صريحة حتى يشمل التراجع أوامر DROP/CREATE أيضًا
+    conn.execute("BEGIN IMMEDIATE")
+    count = 0
+    try:
+        # إعادة القراءة بعد أخذ القفل: ربما طبّقت عملية أخرى اللقطات أثناء الانتظار
+        ensure_state_table(conn)
+        applied = _applied_shas(conn)
+        base_sha = manifest["base"]["sha256"]
+        if base_sha not in applied:
+            base = _read_object(snapshot_dir, base_sha)
+            for t in SNAPSHOT_TABLES:
+                conn.execute(f'DROP TABLE IF EXISTS "{t}"')
+            for sql in base["schema"]:
+                conn.execute(sql)
+            for t, data in base["tables"].items():
+                _insert_rows(conn, t, data, verb="INSERT")
+            conn.execute("DELETE FROM SnapshotApplied")
+            _mark_applied(conn, base_sha, "base")
+            applied = {base_sha}
+            count += 1
+
+        for entry in manifest["deltas"]:
+            if entry["sha256"] in applied:
+                continue
+            delta = _read_object(snapshot_dir, entry["sha256"])
+            for t, data in delta["upsert"].items():
+                _insert_rows(conn, t, data)
+            for t, data in delta["replace"].items():
+                conn.execute(f'DELETE FROM "{t}"')
+                _insert_rows(conn, t, data)
+            _mark_applied(conn, entry["sha256"], "delta")
+            count += 1
+
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    return count
+
+
+if __name__ == "__main__":
+    # الاستعمال: python snapshots.py apply [DB_PATH] [SNAPSHOT_DIR]
+    if len(sys.argv) < 2 or sys.argv[1] != "apply":
+        print("Usage: python snapshots.py apply [DB_PATH] [SNAPSHOT_DIR]")
+        sys.exit(1)
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    db_path = sys.argv[2] if len(sys.argv) > 2 else os.path.join(base_dir, "stocks_morocco.db")
+    snapshot_dir = sys.argv[3] if len(sys.argv) > 3 else os.path.join(base_dir, "snapshots")
+
+    import hot_snapshot
+
+    con = sqlite3.connect(db_path)
+    n = apply_snapshots(con, snapshot_dir)
+    # نفس مسار main.py: لقطة mmap لا تبقى أقدم من القاعدة
+    hot_path = os.path.splitext(db_path)[0] + ".hot"
+    if n or hot_snapshot.is_stale(hot_path, db_path):
+        hot_snapshot.write_hot_snapshot(con, hot_path)
+    con.close()
+    print(f"✅ تم تطبيق {n} لقطة على {db_path}")
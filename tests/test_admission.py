@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+import pytest
+
+pytest.importorskip("starlette")
+
+import admission
+from admission import TokenBucket, WeightedLimiter, client_key
+
+
+def test_limiter_reserves_capacity_for_light_requests():
+    async def run():
+        limiter = WeightedLimiter(capacity=4, heavy_capacity=2, max_queue=1)
+        assert await limiter.acquire(2, timeout=0.01, heavy=True)
+        # الحصة الثقيلة ممتلئة لكن الطلبات الخفيفة ما زالت تمر
+        assert not await limiter.acquire(2, timeout=0.01, heavy=True)
+        assert await limiter.acquire(1, timeout=0.01)
+        assert await limiter.acquire(1, timeout=0.01)
+        assert (limiter.used, limiter.heavy_used) == (4, 2)
+
+    asyncio.run(run())
+
+
+def test_full_heavy_pool_does_not_block_medium_lookups():
+    started = []
+
+    async def app(scope, receive, send):
+        started.append(scope["path"])
+        if scope["path"] == "/company/all":
+            await asyncio.sleep(10)
+
+    async def run():
+        mw = admission.AdmissionMiddleware(app, capacity=16, heavy_capacity=8, queue_timeout=0.05, rate=0)
+        flood = asyncio.ensure_future(mw({"type": "http", "path": "/company/all"}, None, None))
+        await asyncio.sleep(0)
+        assert (mw.limiter.used, mw.limiter.heavy_used) == (8, 8)
+        for path in ("/company/range", "/company/symbol", "/variation/bars"):
+            await mw({"type": "http", "path": path}, None, None)
+        # مسار ثقيل آخر ينتظر ثم يُرفض بـ 503
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        await mw({"type": "http", "path": "/company/range/all", "headers": []}, None, send)
+        assert sent[0]["status"] == 503
+        flood.cancel()
+        return started
+
+    assert asyncio.run(run()) == ["/company/all", "/company/range", "/company/symbol", "/variation/bars"]
+
+
+def test_limiter_wakes_waiter_on_release_and_bounds_queue():
+    async def run():
+        limiter = WeightedLimiter(capacity=1, heavy_capacity=1, max_queue=1)
+        assert await limiter.acquire(1, timeout=0.01)
+        waiter = asyncio.ensure_future(limiter.acquire(1, timeout=1))
+        await asyncio.sleep(0)
+        # الطابور ممتلئ: رفض فوري
+        assert not await limiter.acquire(1, timeout=1)
+        limiter.release(1)
+        assert await waiter
+        assert limiter.used == 1 and limiter.waiting == 0
+
+    asyncio.run(run())
+
+
+def test_limiter_release_survives_cancellation():
+    async def app(scope, receive, send):
+        await asyncio.sleep(10)
+
+    async def run():
+        mw = admission.AdmissionMiddleware(app, capacity=2, heavy_capacity=1, rate=0)
+        task = asyncio.ensure_future(mw({"type": "http", "path": "/company/list"}, None, None))
+        await asyncio.sleep(0)
+        assert mw.limiter.used == 1
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert mw.limiter.used == 0
+
+    asyncio.run(run())
+
+
+def test_token_bucket_limits_and_refills(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(admission.time, "monotonic", lambda: now[0])
+    bucket = TokenBucket(rate=1, burst=2)
+    assert bucket.take("a", 1) == 0
+    assert bucket.take("a", 1) == 0
+    assert bucket.take("a", 1) == pytest.approx(1.0)
+    now[0] += 1
+    assert bucket.take("a", 1) == 0
+
+
+def test_token_bucket_is_lru_capped():
+    bucket = TokenBucket(rate=1, burst=2, max_clients=2)
+    bucket.take("a", 1)
+    bucket.take("b", 1)
+    bucket.take("a", 1)
+    bucket.take("c", 1)
+    assert list(bucket.buckets) == ["a", "c"]
+
+
+def test_client_key_ignores_unknown_api_keys():
+    scope = {"headers": [(b"x-api-key", b"random")], "client": ("10.0.0.1", 1234)}
+    assert client_key(scope, api_keys=frozenset()) == "ip:10.0.0.1"
+    assert client_key(scope, api_keys=frozenset({"known"})) == "ip:10.0.0.1"
+    assert client_key(scope, api_keys=frozenset({"random"})) == "key:random"
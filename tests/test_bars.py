@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+import sqlite3
+
+import pytest
+
+import bars
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    bars.clear_cache()
+    yield
+    bars.clear_cache()
+
+
+def make_db(rows):
+    conn = sqlite3.connect(":memory:")
+    conn.execute("""
+        CREATE TABLE "DailyVariation" (
+            "symbol" TEXT, "timestamp" TEXT, "price" REAL, "change" TEXT,
+            PRIMARY KEY ("symbol", "timestamp")
+        )
+    """)
+    add(conn, rows)
+    return conn
+
+
+def add(conn, rows):
+    conn.executemany("INSERT INTO DailyVariation VALUES ('ADH', ?, ?, NULL)", rows)
+
+
+def spy(monkeypatch):
+    calls = []
+    query = bars.query_bars
+
+    def wrapper(conn, symbol, seconds, since=None):
+        calls.append(since)
+        return query(conn, symbol, seconds, since)
+
+    monkeypatch.setattr(bars, "query_bars", wrapper)
+    return calls
+
+
+def test_buckets_ticks():
+    conn = make_db([
+        ("2026-10-15 10:01:00", 10.0),
+        ("2026-10-15 10:03:00", 12.0),
+        ("2026-10-15 10:04:00", 9.0),
+        ("2026-10-15T10:06:00", 11.0),
+    ])
+    assert bars.query_bars(conn, "ADH", 300) == [
+        {"time": "2026-10-15 10:00:00", "open": 10.0, "high": 12.0, "low": 9.0, "close": 9.0, "ticks": 3},
+        {"time": "2026-10-15 10:05:00", "open": 11.0, "high": 11.0, "low": 11.0, "close": 11.0, "ticks": 1},
+    ]
+
+
+def test_closed_bars_are_cached_and_only_the_open_bar_is_recomputed(monkeypatch):
+    conn = make_db([
+        ("2026-10-15 10:01:00", 10.0),
+        ("2026-10-15 10:06:00", 11.0),
+        ("2026-10-15 10:11:00", 12.0),
+    ])
+    calls = spy(monkeypatch)
+    first = bars.get_bars(conn, "ADH", 300)
+    assert [b["time"][11:16] for b in first] == ["10:00", "10:05", "10:10"]
+
+    # تعديل شمعة مغلقة لا يظهر (الذاكرة)، والشمعة المفتوحة تُحدَّث
+    conn.execute("UPDATE DailyVariation SET price = 99 WHERE timestamp = '2026-10-15 10:01:00'")
+    add(conn, [("2026-10-15 10:12:00", 13.0)])
+    second = bars.get_bars(conn, "ADH", 300)
+    assert second[:2] == first[:2]
+    assert second[2]["close"] == 13.0 and second[2]["ticks"] == 2
+    assert calls == [None, "2026-10-15 10:10:00"]
+
+    # شمعة جديدة تغلق الشمعة السابقة
+    add(conn, [("2026-10-15 10:16:00", 14.0)])
+    third = bars.get_bars(conn, "ADH", 300)
+    assert third[:3] == second
+    assert len(third) == 4
+    assert calls[-1] == "2026-10-15 10:10:00"
+    assert bars.get_bars(conn, "ADH", 300) == third
+    assert calls[-1] == "2026-10-15 10:15:00"
+
+    bars.clear_cache()
+    assert bars.get_bars(conn, "ADH", 300)[0]["open"] == 99.0
+
+
+def test_date_only_and_dmy_ticks_stay_in_the_open_bar():
+    conn = make_db([
+        ("2026-10-15 23:58:00", 8.0),
+        ("2026-10-16", 10.0),
+        ("16/10/2026 00:02:00", 11.0),
+        ("16/10/2026", 9.0),
+    ])
+    first = bars.get_bars(conn, "ADH", 300)
+    assert [b["ticks"] for b in first] == [1, 3]
+    # الطلب التالي يقرأ من بداية الشمعة المفتوحة فقط ويجب أن يجد السجلات الثلاثة
+    assert bars.get_bars(conn, "ADH", 300) == first
+    assert first[-1]["time"] == "2026-10-16 00:00:00"
+    assert (first[-1]["low"], first[-1]["high"]) == (9.0, 11.0)
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import sqlite3
+import time
+
+import hot_snapshot
+
+
+def make_db(path, rows):
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE "Company" (
+            "symbol" TEXT NOT NULL, "name" TEXT, "price" REAL, "open" REAL, "high" REAL,
+            "low" REAL, "change" TEXT, "volume" TEXT, "date" TEXT NOT NULL,
+            PRIMARY KEY ("symbol", "date")
+        )
+    """)
+    conn.executemany("INSERT INTO Company VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    conn.commit()
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+ROWS = [
+    ("ADH", "Addoha", 10.0, 9.5, 10.5, None, "+1.00%", "1200", "2026-10-14"),
+    ("ADH", "Addoha", 11.0, None, 11.5, 10.0, "-0.50%", None, "2026-10-15"),
+    ("IAM", "Maroc Telecom", 100.0, 99.0, 101.0, 98.0, "+0.25%", "50", "2026-10-15"),
+    ("BCP", "Banque Populaire", 250.0, 249.0, 251.0, 248.0, "1,5%", "1.2K", "2026-10-15"),
+]
+
+
+def sql_history(conn, symbol, date_from):
+    rows = conn.execute(
+        "SELECT * FROM Company WHERE symbol=? AND date>=? ORDER BY date DESC", (symbol, date_from)
+    )
+    return [dict(r) for r in rows]
+
+
+def test_write_and_read_matches_sqlite(tmp_path):
+    db = str(tmp_path / "t.db")
+    hot = str(tmp_path / "t.hot")
+    conn = make_db(db, ROWS)
+    assert hot_snapshot.write_hot_snapshot(conn, hot) > 0
+
+    snap = hot_snapshot.HotSnapshot(hot)
+    assert snap.as_of == "2026-10-15"
+    assert snap.calendar == ["2026-10-14", "2026-10-15"]
+    assert {r["symbol"] for r in snap.latest} == {"ADH", "IAM", "BCP"}
+    assert [r["symbol"] for r in snap.companies] == ["ADH", "BCP", "IAM"]
+
+    for symbol in ("ADH", "IAM"):
+        rows = snap.history(symbol, 0)
+        assert rows == sql_history(conn, symbol, "2026-10-14")
+        # JSONResponse يرفض NaN
+        json.dumps(rows, allow_nan=False)
+    assert snap.history("ADH", 1) == sql_history(conn, "ADH", "2026-10-15")
+    assert snap.history("XXX", 0) == []
+
+
+def test_unparsable_change_or_volume_falls_back(tmp_path):
+    conn = make_db(str(tmp_path / "t.db"), ROWS)
+    hot = str(tmp_path / "t.hot")
+    hot_snapshot.write_hot_snapshot(conn, hot)
+    assert hot_snapshot.HotSnapshot(hot).history("BCP", 0) is None
+
+
+def test_renamed_symbol_falls_back(tmp_path):
+    rows = ROWS + [("IAM", "Itissalat Al-Maghrib", 99.0, 99.0, 99.0, 99.0, "+0.10%", "40", "2026-10-14")]
+    conn = make_db(str(tmp_path / "t.db"), rows)
+    hot = str(tmp_path / "t.hot")
+    hot_snapshot.write_hot_snapshot(conn, hot)
+    snap = hot_snapshot.HotSnapshot(hot)
+    assert snap.history("IAM", 0) is None
+    assert snap.history("ADH", 0) == sql_history(conn, "ADH", "2026-10-14")
+
+
+def test_non_iso_dates_skip_the_snapshot(tmp_path):
+    hot = tmp_path / "t.hot"
+    hot.write_bytes(b"old")
+    rows = ROWS + [("ADH", "Addoha", 9.0, 9.0, 9.0, 9.0, "+0.00%", "1", "13/10/2026")]
+    conn = make_db(str(tmp_path / "t.db"), rows)
+    assert hot_snapshot.write_hot_snapshot(conn, str(hot)) is None
+    assert not hot.exists()
+
+
+def test_empty_db_skips_the_snapshot(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "t.db"))
+    assert hot_snapshot.write_hot_snapshot(conn, str(tmp_path / "t.hot")) is None
+    assert not (tmp_path / "t.hot").exists()
+
+
+def test_get_hot_snapshot_ignores_stale_file_and_reloads(tmp_path):
+    db = str(tmp_path / "t.db")
+    hot = str(tmp_path / "t.hot")
+    conn = make_db(db, ROWS)
+    hot_snapshot.write_hot_snapshot(conn, hot)
+    first = hot_snapshot.get_hot_snapshot(hot, db)
+    assert first is not None
+
+    # القاعدة أحدث من اللقطة
+    later = time.time() + 10
+    os.utime(db, (later, later))
+    assert hot_snapshot.is_stale(hot, db)
+    assert hot_snapshot.get_hot_snapshot(hot, db) is None
+
+    hot_snapshot.write_hot_snapshot(conn, hot)
+    os.utime(hot, (later + 1, later + 1))
+    second = hot_snapshot.get_hot_snapshot(hot, db)
+    assert second is not None and second is not first
+    assert not [n for n in os.listdir(tmp_path) if n.startswith("t.hot.")]
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+
+from fastapi.testclient import TestClient
+
+import main
+
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(main.app)
+
+
+def test_serves_schema_with_etag(client):
+    resp = client.get("/openapi.json")
+    assert resp.status_code == 200
+    assert resp.headers["etag"]
+    assert "/company/performance" in resp.json()["paths"]
+
+    ar = client.get("/openapi.json", params={"lang": "ar"})
+    assert ar.status_code == 200
+    assert ar.headers["etag"] != resp.headers["etag"]
+
+
+def test_if_none_match_returns_304(client):
+    etag = client.get("/openapi.json").headers["etag"]
+    for header in (etag, "W/" + etag, "*", '"other", ' + etag, '"other",W/' + etag):
+        resp = client.get("/openapi.json", headers={"If-None-Match": header})
+        assert resp.status_code == 304, header
+        assert resp.headers["etag"] == etag
+        assert resp.content == b""
+
+    resp = client.get("/openapi.json", headers={"If-None-Match": '"other"'})
+    assert resp.status_code == 200
+
+
+def test_unknown_lang_is_400(client):
+    assert client.get("/openapi.json", params={"lang": "fr"}).status_code == 400
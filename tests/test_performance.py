@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+import sqlite3
+
+import pytest
+
+from performance import refresh_performance
+
+AS_OF = "2026-10-16"
+
+ROWS = [
+    # symbol, name, price, high, low, volume, date
+    ("ADH", "Addoha", 100.0, 105.0, 95.0, "1000", "2026-09-16"),
+    ("ADH", "Addoha", 110.0, 120.0, 0.0, "2000", "2026-10-01"),
+    ("ADH", "Addoha", 90.0, 92.0, 88.0, "3000", "2026-10-09"),
+    ("ADH", "Addoha", 99.0, 101.0, 97.0, "4000", AS_OF),
+    # مُدرج حديثًا
+    ("NEW", "New Co", 10.0, 10.0, 10.0, "10", "2026-10-15"),
+    ("NEW", "New Co", 12.0, 12.0, 12.0, "10", AS_OF),
+    # مشطوب: لا سجل منذ 2026-10-01
+    ("OLD", "Old Co", 50.0, 50.0, 50.0, "5", "2026-09-16"),
+    ("OLD", "Old Co", 40.0, 40.0, 40.0, "5", "2026-10-01"),
+]
+
+
+@pytest.fixture
+def perf():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("""
+        CREATE TABLE "Company" (
+            "symbol" TEXT NOT NULL, "name" TEXT, "price" REAL, "open" REAL, "high" REAL,
+            "low" REAL, "change" TEXT, "volume" TEXT, "date" TEXT NOT NULL,
+            PRIMARY KEY ("symbol", "date")
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE "CompanyPerformance" (
+            "symbol" TEXT NOT NULL, "name" TEXT, "period" TEXT NOT NULL, "days" INTEGER NOT NULL,
+            "start_date" TEXT, "start_price" REAL, "end_date" TEXT, "end_price" REAL,
+            "return_pct" REAL, "high" REAL, "low" REAL, "avg_volume" REAL, "as_of" TEXT NOT NULL,
+            PRIMARY KEY ("symbol", "period")
+        )
+    """)
+    conn.executemany(
+        "INSERT INTO Company (symbol, name, price, high, low, volume, date) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        ROWS,
+    )
+    cur = conn.cursor()
+    assert refresh_performance(cur, AS_OF) > 0
+    conn.row_factory = sqlite3.Row
+    return {
+        (r["symbol"], r["period"]): dict(r)
+        for r in conn.execute("SELECT * FROM CompanyPerformance")
+    }
+
+
+def test_full_history_periods(perf):
+    week = perf[("ADH", "week")]
+    assert (week["start_date"], week["start_price"], week["end_date"], week["end_price"]) == (
+        "2026-10-09", 90.0, AS_OF, 99.0,
+    )
+    assert week["return_pct"] == pytest.approx(10.0)
+    assert (week["high"], week["low"], week["avg_volume"]) == (101.0, 88.0, 3500.0)
+
+    month = perf[("ADH", "month")]
+    assert (month["start_date"], month["start_price"], month["end_price"]) == ("2026-09-16", 100.0, 99.0)
+    assert month["return_pct"] == pytest.approx(-1.0)
+    # low = 0 يُتجاهل
+    assert (month["high"], month["low"], month["avg_volume"]) == (120.0, 88.0, 2500.0)
+    assert month["name"] == "Addoha" and month["as_of"] == AS_OF
+
+
+def test_partial_history_has_no_return(perf):
+    # مُدرج بعد بداية الفترة
+    assert perf[("NEW", "week")]["return_pct"] is None
+    assert perf[("NEW", "week")]["start_date"] == "2026-10-15"
+    # مشطوب قبل as_of
+    assert perf[("OLD", "month")]["return_pct"] is None
+    assert perf[("OLD", "month")]["end_date"] == "2026-10-01"
+    assert ("OLD", "week") not in perf
+    # القاعدة لا تغطي بداية الفترة
+    assert perf[("ADH", "3months")]["return_pct"] is None
+    assert perf[("ADH", "3months")]["high"] == 120.0
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+
+import snapshots
+
+SCHEMA = [
+    """
+    CREATE TABLE "Company" (
+        "symbol" TEXT NOT NULL, "name" TEXT, "price" REAL, "open" REAL, "high" REAL,
+        "low" REAL, "change" TEXT, "volume" TEXT, "date" TEXT NOT NULL,
+        PRIMARY KEY ("symbol", "date")
+    )
+    """,
+    "CREATE INDEX idx_company_date ON Company(date)",
+    """
+    CREATE TABLE "DailyVariation" (
+        "symbol" TEXT, "timestamp" TEXT, "price" REAL, "change" TEXT,
+        PRIMARY KEY ("symbol", "timestamp")
+    )
+    """,
+    """
+    CREATE TABLE "CompanyPerformance" (
+        "symbol" TEXT NOT NULL, "period" TEXT NOT NULL, "return_pct" REAL,
+        PRIMARY KEY ("symbol", "period")
+    )
+    """,
+]
+
+
+def make_source(path):
+    conn = sqlite3.connect(path)
+    for sql in SCHEMA:
+        conn.execute(sql)
+    conn.commit()
+    return conn
+
+
+def ingest(conn, day, price):
+    ts = f"{day} 18:30:00"
+    conn.execute("DELETE FROM Company WHERE date = ?", (day,))
+    for symbol in ("ADH", "IAM"):
+        conn.execute(
+            "INSERT INTO Company VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (symbol, symbol.lower(), price, price, price + 1, None, "+1.00%", "100", day),
+        )
+        conn.execute("INSERT INTO DailyVariation VALUES (?, ?, ?, ?)", (symbol, ts, price, "+1.00%"))
+    conn.execute("DELETE FROM CompanyPerformance")
+    conn.execute("INSERT INTO CompanyPerformance VALUES ('ADH', 'week', ?)", (price,))
+    conn.commit()
+    return ts
+
+
+def dump(conn):
+    return {
+        t: sorted(conn.execute(f'SELECT * FROM "{t}"').fetchall(), key=repr)
+        for t in snapshots.SNAPSHOT_TABLES
+    }
+
+
+def test_base_and_delta_round_trip(tmp_path):
+    snap_dir = str(tmp_path / "snapshots")
+    src = make_source(str(tmp_path / "src.db"))
+
+    ts = ingest(src, "2026-10-01", 10.0)
+    kind, _, _ = snapshots.write_snapshot(src, snap_dir, "2026-10-01", ts)
+    assert kind == "base"
+    ts = ingest(src, "2026-10-02", 11.0)
+    kind, _, _ = snapshots.write_snapshot(src, snap_dir, "2026-10-02", ts)
+    assert kind == "delta"
+
+    dst = sqlite3.connect(str(tmp_path / "dst.db"))
+    assert snapshots.apply_snapshots(dst, snap_dir) == 2
+    assert dump(dst) == dump(src)
+    assert snapshots.apply_snapshots(dst, snap_dir) == 0
+
+    # فرق جديد يُطبّق وحده على قاعدة متزامنة مسبقًا
+    ts = ingest(src, "2026-10-03", 12.0)
+    snapshots.write_snapshot(src, snap_dir, "2026-10-03", ts)
+    assert snapshots.apply_snapshots(dst, snap_dir) == 1
+    assert dump(dst) == dump(src)
+
+
+def test_new_base_rebuilds_and_prunes(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshots, "BASE_EVERY", 1)
+    snap_dir = str(tmp_path / "snapshots")
+    src = make_source(str(tmp_path / "src.db"))
+    dst = sqlite3.connect(str(tmp_path / "dst.db"))
+
+    for i, day in enumerate(("2026-10-01", "2026-10-02", "2026-10-03")):
+        ts = ingest(src, day, 10.0 + i)
+        snapshots.write_snapshot(src, snap_dir, day, ts)
+        snapshots.apply_snapshots(dst, snap_dir)
+
+    manifest = snapshots.read_manifest(snap_dir)
+    assert manifest["deltas"] == []
+    assert len(list((tmp_path / "snapshots" / "objects").iterdir())) == 1
+    assert dump(dst) == dump(src)
+
+
+def test_concurrent_apply_is_serialized(tmp_path):
+    snap_dir = str(tmp_path / "snapshots")
+    src = make_source(str(tmp_path / "src.db"))
+    ts = ingest(src, "2026-10-01", 10.0)
+    snapshots.write_snapshot(src, snap_dir, "2026-10-01", ts)
+
+    db_path = str(tmp_path / "dst.db")
+    results, errors = [], []
+
+    def apply():
+        conn = sqlite3.connect(db_path)
+        try:
+            results.append(snapshots.apply_snapshots(conn, snap_dir))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            conn.close()
+
+    threads = [threading.Thread(target=apply) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert sorted(results) == [0, 0, 0, 1]
+    assert dump(sqlite3.connect(db_path)) == dump(src)
+
+
+def test_cli_apply_on_empty_db_without_manifest(tmp_path):
+    # أول تشغيل للـ workflow: لا قاعدة ولا مجلد لقطات بعد
+    db = tmp_path / "stocks_morocco.db"
+    root = os.path.dirname(os.path.abspath(snapshots.__file__))
+    result = subprocess.run(
+        [sys.executable, os.path.join(root, "snapshots.py"), "apply", str(db), str(tmp_path / "snapshots")],
+        capture_output=True, text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    assert not (tmp_path / "stocks_morocco.hot").exists()
@@ -1,13 +1,19 @@
 # -*- coding: utf-8 -*-
 import os
 import sqlite3
+import sys
 from datetime import datetime
 import requests
+import hot_snapshot
+import snapshots
+from performance import refresh_performance
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(BASE_DIR, "stocks_morocco.db")
+SNAPSHOT_DIR = os.path.join(BASE_DIR, "snapshots")
+HOT_SNAPSHOT_PATH = os.path.join(BASE_DIR, "stocks_morocco.hot")
 
 URL = "https://scanner.tradingview.com/morocco/scan"
 HEADERS = {
@@ -53,6 +59,26 @@ def ensure_tables(conn):
         )
     """)
 
+    # جدول الأداء المحسوب مسبقًا لكل رمز ولكل فترة (انظر performance.py)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS "CompanyPerformance" (
+            "symbol"      TEXT NOT NULL,
+            "name"        TEXT,
+            "period"      TEXT NOT NULL,
+            "days"        INTEGER NOT NULL,
+            "start_date"  TEXT,
+            "start_price" REAL,
+            "end_date"    TEXT,
+            "end_price"   REAL,
+            "return_pct"  REAL,
+            "high"        REAL,
+            "low"         REAL,
+            "avg_volume"  REAL,
+            "as_of"       TEXT NOT NULL,
+            PRIMARY KEY ("symbol", "period")
+        )
+    """)
+
 def safe_float(val):
     try: return float(val) if val is not None else 0.0
     except: return 0.0
@@ -157,8 +183,38 @@ def update_data():
         except:
             pass
 
+    # تحديث جدول الأداء ضمن نفس المعاملة
+    try:
+        perf_count = refresh_performance(cur, current_date)
+        print(f"✅ تم حساب {perf_count} سجل أداء في جدول CompanyPerformance")
+    except Exception as e:
+        print(f"❌ خطأ في حساب الأداء: {e}")
+        con.rollback()
+        con.close()
+        return
+
     con.commit()
 
+    # كتابة لقطة مضغوطة (فرق يومي أو لقطة أساسية) لتوزيعها بدل ملف القاعدة
+    try:
+        kind, sha, size = snapshots.write_snapshot(con, SNAPSHOT_DIR, current_date, current_ts)
+        print(f"📦 تم حفظ لقطة {kind}: {sha[:12]} ({size} بايت)")
+    except Exception as e:
+        # القاعدة تُعاد بناؤها من اللقطات في كل تشغيل، فبدون اللقطة تضيع بيانات اليوم
+        print(f"❌ خطأ في حفظ اللقطة: {e}")
+        con.close()
+        sys.exit(1)
+
+    # لقطة mmap لنتائج الاستعلامات الأكثر طلبًا (تُقرأ من عمليات الـ API مباشرة)
+    try:
+        size = hot_snapshot.write_hot_snapshot(con, HOT_SNAPSHOT_PATH)
+        if size is None:
+            print("⚠️  لم تُكتب لقطة mmap: توجد تواريخ بغير صيغة YYYY-MM-DD")
+        else:
+            print(f"⚡ تم حفظ لقطة mmap: {HOT_SNAPSHOT_PATH} ({size} بايت)")
+    except Exception as e:
+        print(f"❌ خطأ في حفظ لقطة mmap: {e}")
+
     # اختبار البحث بالتاريخ
     print(f"\n{'='*60}")
     print(f"🔍 اختبار البحث بالتاريخ: {current_date}")